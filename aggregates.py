@@ -0,0 +1,137 @@
+import csv
+import json
+import os
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent
+SUMMARY_DIR = PROJECT_ROOT / "summary"
+STATE_FILE = "aggregates_state.json"  # Per-serial partial sums, so a later merge only touches new serials
+MODELS_CSV = PROJECT_ROOT / "models.csv"  # CSV file for models
+
+def to_qty(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+def is_customer_serviceable(value) -> bool:
+    """'1 (T1 CRU)' / '2 (T2 CRU)' are customer replaceable, '9 (FRU)' is not."""
+    return "CRU" in str(value or "").upper()
+
+def load_models(models_csv=MODELS_CSV) -> dict:
+    """Load Serial -> Model from CSV (empty if the file is missing)."""
+    models = {}
+    if not Path(models_csv).exists():
+        return models
+    with open(models_csv, 'r', newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            serial = row.get('Serial', '').strip().upper()
+            if serial:
+                models[serial] = row.get('Model', 'N/A')
+    return models
+
+class PartsAggregates:
+    """Pivot-style totals built row by row during combine.
+
+    Each serial's contribution is kept separately, so merging a serial again
+    replaces its numbers instead of adding them twice, and the model join is
+    done at write time against the current models.csv.
+    """
+
+    def __init__(self, summary_dir=SUMMARY_DIR):
+        self.summary_dir = Path(summary_dir)
+        self.state_path = self.summary_dir / STATE_FILE
+        self.serials = {}
+        if self.state_path.exists():
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.serials = json.load(f)
+
+    def source(self, serial: str) -> str | None:
+        """Export file the serial's numbers were computed from."""
+        return self.serials.get(serial.strip().upper(), {}).get("source")
+
+    def add_serial(self, serial: str, rows, source: str | None = None):
+        parts = {}  # part number -> [description, rows, installed qty]
+        commodities = {}  # commodity type -> [rows, installed qty]
+        serviceable = 0
+        total = 0
+        for row in rows:
+            if len(row) < 7:
+                continue
+            desc, comm_type, part_num, qty, _, _, cust_serv = row[:7]
+            qty = to_qty(qty)
+            total += 1
+            part = parts.setdefault(str(part_num or ""), [desc, 0, 0])
+            part[1] += 1
+            part[2] += qty
+            commodity = commodities.setdefault(str(comm_type or ""), [0, 0])
+            commodity[0] += 1
+            commodity[1] += qty
+            if is_customer_serviceable(cust_serv):
+                serviceable += 1
+        self.serials[serial.strip().upper()] = {"rows": total, "serviceable": serviceable,
+                                                "parts": parts, "commodities": commodities, "source": source}
+
+    def save(self):
+        self.summary_dir.mkdir(exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.serials, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.state_path)
+
+    def totals(self, models: dict):
+        """Fold per-serial numbers into per-model totals."""
+        by_part, by_commodity, by_model = {}, {}, {}
+        for serial, agg in self.serials.items():
+            model = models.get(serial, "N/A")
+            m = by_model.setdefault(model, [0, 0, 0])  # serials, rows, serviceable rows
+            m[0] += 1
+            m[1] += agg["rows"]
+            m[2] += agg["serviceable"]
+            for part_num, (desc, rows, qty) in agg["parts"].items():
+                p = by_part.setdefault((model, part_num), [desc, 0, 0, 0])  # description, serials, rows, qty
+                p[1] += 1
+                p[2] += rows
+                p[3] += qty
+            for comm_type, (rows, qty) in agg["commodities"].items():
+                for key in ((model, comm_type), ("(all)", comm_type)):
+                    c = by_commodity.setdefault(key, [0, 0])
+                    c[0] += rows
+                    c[1] += qty
+        return by_part, by_commodity, by_model
+
+    def write_summaries(self, models_csv=MODELS_CSV) -> list[Path]:
+        """Write the summary CSVs; returns their paths."""
+        by_part, by_commodity, by_model = self.totals(load_models(models_csv))
+        self.summary_dir.mkdir(exist_ok=True)
+        outputs = {
+            "parts_per_model.csv": (
+                ["Model", "Part Number", "Description", "Serials", "Rows", "Installed Qty"],
+                [[model, part_num, desc, serials, rows, qty]
+                 for (model, part_num), (desc, serials, rows, qty) in sorted(by_part.items())]),
+            "commodity_totals.csv": (
+                ["Model", "Commodity Type", "Rows", "Installed Qty"],
+                [[model, comm_type, rows, qty] for (model, comm_type), (rows, qty) in sorted(by_commodity.items())]),
+            "serviceability.csv": (
+                ["Model", "Serials", "Rows", "Customer Serviceable Rows", "Customer Serviceable Ratio"],
+                [[model, serials, rows, cru, round(cru / rows, 4) if rows else 0]
+                 for model, (serials, rows, cru) in sorted(by_model.items())]),
+        }
+        paths = []
+        for name, (header, rows) in outputs.items():
+            path = self.summary_dir / name
+            with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(header)
+                writer.writerows(rows)
+            paths.append(path)
+        return paths
+
+def main():
+    """Rewrite the summary CSVs from the saved state, e.g. after models.csv was updated."""
+    aggregates = PartsAggregates()
+    paths = aggregates.write_summaries()
+    print(f"✓ Wrote {', '.join(p.name for p in paths)} for {len(aggregates.serials)} serials to {SUMMARY_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,107 @@
 import os
 import openpyxl
-from openpyxl import load_workbook
+from openpyxl import Workbook, load_workbook
+from aggregates import PartsAggregates
+from pack import PackReader, serial_from_filename
+from partsdb import PartsStore
+from sheetwriter import ShardedSheetWriter, group_rows_by_serial, iter_shard_rows, read_header, read_manifest
 
 # Paths
 exports_dir = 'downloads'  # Directory with separate PartsExport_*.xlsx files
+pack_dir = 'downloads_pack'  # Packed exports (see pack.py); used alongside exports_dir
 mega_file = 'output.xlsx'  # The existing mega file to append to
+db_file = 'parts.db'  # Indexed store with the same rows (query with partsdb.py)
+models_csv = 'models.csv'
+summary_dir = 'summary'  # Small per-model summary CSVs, updated on every merge
 
-# Load the mega workbook
-wb = load_workbook(mega_file)
-sheet = wb['Состав']  # Select the sheet named "Состав"
-
-# Process each separate file
-for filename in os.listdir(exports_dir):
-    if filename.startswith('PartsExport_Serial-') and filename.endswith('.xlsx'):
-        file_path = os.path.join(exports_dir, filename)
-        
-        # Extract serial number from filename (e.g., '06fm735' from 'PartsExport_Serial-06fm735_...')
-        serial = filename.split('Serial-')[1].split('_')[0]
-        
+# Состав rolls over to Состав_2, Состав_3... (or output_2.xlsx... with split_files) at this many rows
+max_rows_per_shard = 1_000_000
+split_files = False
+default_header = ['Description', 'Commodity Type', 'Part Number', 'Installed Qty', 'MFG Part Number', None,
+                  'Customer Serviceable', 'Serial']
+
+def append_rows(writer, rows, serial, source):
+    rows = list(rows)
+    store.add_serial(serial, rows, source)
+    aggregates.add_serial(serial, rows, source)
+    row_list = []
+    for row in rows:
+        # Unpack 7 columns: Description, Commodity Type, Part Number, Installed Qty, MFG Part Number, (empty), Customer Serviceable
+        if len(row) >= 7:
+            desc, comm_type, part_num, qty, mfg_part, empty, cust_serv = row[:7]
+
+            # Append serial as the 8th column
+            row_list.append([desc, comm_type, part_num, qty, mfg_part, empty, cust_serv, serial])
+
+    # Append to mega sheet (all rows of a serial go into the same shard)
+    writer.write_serial(serial, row_list)
+
+# Stream the mega workbook into a new write-only one: other sheets are copied as they are
+src = load_workbook(mega_file, read_only=True)
+wb = Workbook(write_only=True)
+for name in src.sheetnames:
+    if name == 'Состав' or name.startswith('Состав_'):
+        continue
+    copy = wb.create_sheet(name)
+    for row in src[name].iter_rows(values_only=True):
+        copy.append(row)
+src.close()
+
+store = PartsStore(db_file)
+aggregates = PartsAggregates(summary_dir)
+if os.path.exists(models_csv):
+    store.load_models(models_csv)
+
+# A serial whose export file (names carry the download time) is the one already in Состав,
+# parts.db and the summary state is kept as it is instead of being read again
+stored_sources = store.sources()
+in_sheet = {row['Serial'].upper() for row in read_manifest(mega_file)}
+
+def unchanged(serial, source):
+    serial = serial.upper()
+    return serial in in_sheet and stored_sources.get(serial) == source and aggregates.source(serial) == source
+
+with PackReader(pack_dir) as reader:
+    packed = {serial for serial, entry in reader.index.items() if not unchanged(serial, entry["source"])}
+
+    # Latest separate file per serial that is not in the pack yet (timestamps in the names sort chronologically)
+    exports = {}
+    for filename in sorted(os.listdir(exports_dir)):
+        if filename.startswith('PartsExport_Serial-') and filename.endswith('.xlsx'):
+            serial = serial_from_filename(filename)
+            if serial and serial not in reader:
+                exports[serial.lower()] = filename
+    exports = {serial: filename for serial, filename in exports.items() if not unchanged(serial, filename)}
+    merged = packed | {serial.upper() for serial in exports}
+
+    # Keep the existing Состав rows (across all shards) in front of the new ones,
+    # except for serials that are merged again below
+    header = read_header(mega_file, 'Состав') or default_header
+    existing = iter_shard_rows(mega_file, 'Состав', min_row=2)
+    writer = ShardedSheetWriter(mega_file, header, sheet_name='Состав', max_rows=max_rows_per_shard,
+                                split_files=split_files, workbook=wb)
+    for serial, rows in group_rows_by_serial(existing, 7):
+        if str(serial or '').upper() not in merged:
+            writer.write_serial(serial, rows)
+
+    # Process packed exports first
+    for serial, rows in reader.items(packed):
+        append_rows(writer, rows, serial.lower(), reader.index[serial]["source"])
+
+    for serial, filename in exports.items():
         # Load separate workbook
-        wb_sep = load_workbook(file_path)
+        wb_sep = load_workbook(os.path.join(exports_dir, filename), read_only=True)
         sheet_sep = wb_sep.active
-        
+
         # Skip header row, process data rows
-        for row in sheet_sep.iter_rows(min_row=2, values_only=True):
-            # Unpack 7 columns: Description, Commodity Type, Part Number, Installed Qty, MFG Part Number, (empty), Customer Serviceable
-            if len(row) >= 7:
-                desc, comm_type, part_num, qty, mfg_part, empty, cust_serv = row[:7]
-                
-                # Append serial as the 8th column
-                row_list = [desc, comm_type, part_num, qty, mfg_part, empty, cust_serv, serial]
-                
-                # Append to mega sheet
-                sheet.append(row_list)
+        append_rows(writer, sheet_sep.iter_rows(min_row=2, values_only=True), serial, filename)
+        wb_sep.close()
 
 # Save the updated mega file
-wb.save(mega_file)
-print("All files combined into", mega_file, "sheet 'Состав'")
\ No newline at end of file
+shards = writer.close()
+store.commit()
+store.close()
+aggregates.save()
+aggregates.write_summaries(models_csv)
+print(f"Merged {len(merged)} new or changed serials.")
+print("All files combined into", mega_file, f"sheet 'Состав' ({writer.total_rows} rows in {shards} shard(s)) and", db_file, "(summaries in", summary_dir + ")")
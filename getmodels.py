@@ -3,13 +3,19 @@ import sys
 import random
 import os
 import csv
+import shutil
 from pathlib import Path
 from playwright.async_api import async_playwright
 import time
+from metrics import metrics, start_metrics_server
 
 PROJECT_ROOT = Path(__file__).parent
+METRICS_PORT = 9101  # Dashboard port (see metrics.py)
 MODELS_CSV = PROJECT_ROOT / "models.csv"  # CSV file for models
 RES_CSV = PROJECT_ROOT / "newmodels.csv"  # CSV file for models
+SHARED_PROFILE_DIR = PROJECT_ROOT / "lenovo_cookies"
+# Own browser profile (seeded from lenovo_cookies), so this can run while manualapp.py has that one open
+PROFILE_DIR = PROJECT_ROOT / "lenovo_cookies_models"
 
 # List of user-agents to rotate
 USER_AGENTS = [
@@ -18,6 +24,19 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
 ]
 
+def prepare_profile():
+    """Create PROFILE_DIR from a copy of the shared profile (cookies, logins) the first time."""
+    if PROFILE_DIR.exists():
+        return PROFILE_DIR
+    if SHARED_PROFILE_DIR.exists():
+        # Skip Chromium's lock files and caches; they belong to the browser that owns the original
+        shutil.copytree(SHARED_PROFILE_DIR, PROFILE_DIR,
+                        ignore=shutil.ignore_patterns("Singleton*", "Cache", "Code Cache", "GPUCache"))
+        print(f"✓ Copied browser profile to {PROFILE_DIR.name}")
+    else:
+        PROFILE_DIR.mkdir(parents=True)
+    return PROFILE_DIR
+
 def load_serials_from_csv():
     """Load unique serials from the CSV file."""
     unique_serials = set()
@@ -62,6 +81,8 @@ async def get_model_for_serial(serial: str, context, semaphore, index: int, tota
     async with semaphore:
         user_agent = random.choice(USER_AGENTS)
         page = await context.new_page()
+        metrics.add("in_flight_pages", 1)
+        phases = metrics.phase_timer()
         await page.set_extra_http_headers({"User-Agent": user_agent})
         
         try:
@@ -70,6 +91,7 @@ async def get_model_for_serial(serial: str, context, semaphore, index: int, tota
             print(f"Processing {index}/{total}: {serial} - Navigating to parts page")
             
             await page.goto(base_url, wait_until="domcontentloaded", timeout=15000)
+            phases.mark("navigate")
 
             # Handle country modal
             try:
@@ -101,6 +123,7 @@ async def get_model_for_serial(serial: str, context, semaphore, index: int, tota
             # Wait for the product name text to appear
             prod_name_locator = page.locator('div.prod-name-text')
             await prod_name_locator.wait_for(state="visible", timeout=5000)
+            phases.mark("search")
             await asyncio.sleep(5)
             
             # Scrape the model
@@ -115,6 +138,7 @@ async def get_model_for_serial(serial: str, context, semaphore, index: int, tota
             return serial, "N/A"
             
         finally:
+            metrics.add("in_flight_pages", -1)
             await page.close()
 
 async def process_batch(serials, context, semaphore, start_index, total):
@@ -142,14 +166,15 @@ async def main():
     total = len(remaining_serials)
     print(f"Processing {total} serials (including {len(invalid_serials)} invalid re-processes).")
     start_time = time.time()
+    start_metrics_server(METRICS_PORT)
+    metrics.set("serials_total", total)
     
     models = valid_models.copy()  # Start with valid existing
     
     semaphore = asyncio.Semaphore(10)  # Limit concurrency to 10
     
     async with async_playwright() as p:
-        user_data_dir = PROJECT_ROOT / "lenovo_cookies"
-        user_data_dir.mkdir(parents=True, exist_ok=True)
+        user_data_dir = prepare_profile()
         
         # Initial context
         context = await p.chromium.launch_persistent_context(
@@ -186,13 +211,16 @@ async def main():
                 models[serial] = model
                 if model not in ("N/A", "SR665 (ThinkSystem) - Type 7D2V - Model 7D2VCTO1WW"):
                     successes += 1
+                    metrics.serial_finished(True)
                 else:
                     failures += 1
+                    metrics.serial_finished(False)
             processed += len(batch)
             
             # Restart context every 5 batches to keep JS cache low
             if batch_count % 5 == 0:
                 print("Restarting browser context to clear JavaScript cache.")
+                metrics.inc("context_restarts")
                 await context.close()
                 context = await p.chromium.launch_persistent_context(
                     user_data_dir=user_data_dir,
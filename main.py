@@ -1,5 +1,206 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent
+STATE_FILE = PROJECT_ROOT / ".pipeline_state.json"
+
+# Pipeline stages: script to run, stages it depends on, files/dirs it reads and writes.
+# A stage reruns when one of its inputs (its own script included) changed since its last
+# successful run, when one of its outputs is missing, or when a dependency ran just now.
+STAGES = {
+    "download": {"script": "manualapp.py", "deps": [], "inputs": ["serials.xlsx"], "outputs": ["downloads"]},
+    "models": {"script": "getmodels.py", "deps": [], "inputs": ["models.csv"], "outputs": ["newmodels.csv"]},
+    "missing": {"script": "find_missing_serials.py", "deps": ["models"], "inputs": ["output.xlsx", "models.csv"], "outputs": []},
+    "merge": {"script": "combine.py", "deps": ["download", "models"], "inputs": ["downloads", "downloads_pack", "models.csv"],
+              "outputs": ["output.xlsx", "parts.db", "summary"]},
+    "enrich": {"script": "updatespreadsheet.py", "deps": ["merge", "models"], "inputs": ["models.csv"], "outputs": ["output.xlsx"]},
+}
+
+# Exit code of a stage that did its job but left some work for the next run (e.g. serials that
+# failed to download): its dependents still run, but it is not recorded as up to date
+EXIT_INCOMPLETE = 3
+
+print_lock = threading.Lock()
+
+def log(message):
+    with print_lock:
+        print(message, flush=True)
+
+def fingerprint(path: Path) -> str | None:
+    """Content hash for files; name/size/mtime listing for directories (hashing 12k exports is too slow)."""
+    if path.is_file():
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    if path.is_dir():
+        digest = hashlib.sha256()
+        for entry in sorted(path.iterdir()):
+            stat = entry.stat()
+            digest.update(f"{entry.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+    return None
+
+def stage_inputs(name) -> list[str]:
+    stage = STAGES[name]
+    return [stage["script"]] + stage["inputs"]
+
+def load_state() -> dict:
+    if STATE_FILE.exists():
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def save_state(state):
+    tmp_path = STATE_FILE.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    tmp_path.replace(STATE_FILE)
+
+def stale_reason(name, state, ran, forced) -> str | None:
+    """Why a stage has to run, or None if it is up to date."""
+    if name in forced:
+        return "forced"
+    ran_deps = [dep for dep in STAGES[name]["deps"] if dep in ran]
+    if ran_deps:
+        return f"{', '.join(ran_deps)} ran"
+    previous = state.get(name)
+    if not previous:
+        return "never ran"
+    if previous.get("incomplete"):
+        return "left work over last time"
+    for rel in stage_inputs(name):
+        if fingerprint(PROJECT_ROOT / rel) != previous["inputs"].get(rel):
+            return f"{rel} changed"
+    for rel in STAGES[name]["outputs"]:
+        if not (PROJECT_ROOT / rel).exists():
+            return f"{rel} missing"
+    return None
+
+def run_stage(name) -> str:
+    """Run a stage's script; returns "ok", "incomplete" or "failed"."""
+    script = STAGES[name]["script"]
+    log(f"▶ {name}: {script}")
+    start = time.time()
+    # Unbuffered, so progress lines show up as they are printed rather than in 8 KB blocks
+    proc = subprocess.Popen([sys.executable, "-u", script], cwd=PROJECT_ROOT, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True, bufsize=1,
+                            env={**os.environ, "PYTHONUNBUFFERED": "1"})
+    for line in proc.stdout:
+        log(f"[{name}] {line.rstrip()}")
+    code = proc.wait()
+    elapsed = time.time() - start
+    if code == 0:
+        log(f"✓ {name} finished in {elapsed:.1f}s")
+        return "ok"
+    if code == EXIT_INCOMPLETE:
+        log(f"• {name} finished with work left over in {elapsed:.1f}s; it will run again next time")
+        return "incomplete"
+    log(f"✗ {name} failed (exit {code}) in {elapsed:.1f}s")
+    return "failed"
+
+def selected_stages(only, with_deps=True) -> set:
+    """The requested stages plus (unless with_deps is off) everything they depend on."""
+    if not only:
+        return set(STAGES)
+    if not with_deps:
+        return set(only)
+    selected = set()
+    todo = list(only)
+    while todo:
+        name = todo.pop()
+        if name not in selected:
+            selected.add(name)
+            todo.extend(STAGES[name]["deps"])
+    return selected
+
+def run_pipeline(only=None, force=False, dry_run=False, max_parallel=2, with_deps=True):
+    """Run stages in dependency order, independent ones at the same time, skipping up-to-date ones.
+
+    force reruns only the named stages (all of them when none are named); with_deps=False
+    runs just the named stages on the existing outputs of their dependencies.
+    """
+    state = load_state()
+    pending = selected_stages(only, with_deps)
+    forced = (set(only) if only else set(STAGES)) if force else set()
+    ran, failed = set(), set()
+    finished = set(STAGES) - pending  # Stages left out are taken as they are
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        while pending or running:
+            for name in sorted(pending):
+                deps = STAGES[name]["deps"]
+                if any(dep in failed for dep in deps):
+                    log(f"✗ {name} skipped: dependency failed")
+                    failed.add(name)
+                    pending.discard(name)
+                    continue
+                if not all(dep in finished for dep in deps):
+                    continue
+                pending.discard(name)
+                reason = stale_reason(name, state, ran, forced)
+                if reason is None:
+                    log(f"• {name} up to date")
+                    finished.add(name)
+                elif dry_run:
+                    log(f"• {name} would run ({reason})")
+                    ran.add(name)
+                    finished.add(name)
+                else:
+                    log(f"• {name} needs to run ({reason})")
+                    running[pool.submit(run_stage, name)] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                result = future.result()
+                if result == "failed":
+                    failed.add(name)
+                    continue
+                ran.add(name)
+                finished.add(name)
+                # Fingerprint after the run, so a stage rewriting its own input does not trigger itself
+                state[name] = {"finished": time.time(),
+                               "inputs": {rel: fingerprint(PROJECT_ROOT / rel) for rel in stage_inputs(name)}}
+                if result == "incomplete":
+                    state[name]["incomplete"] = True
+                save_state(state)
+
+    if failed:
+        log(f"✗ Failed: {', '.join(sorted(failed))}")
+    return not failed
+
 def main():
-    print("Hello from parsertest!")
+    parser = argparse.ArgumentParser(description="Run the parts pipeline, rerunning only stale stages.")
+    parser.add_argument("stages", nargs="*", metavar="STAGE",
+                        help=f"Stages to bring up to date (with their dependencies): {', '.join(STAGES)}")
+    parser.add_argument("--force", action="store_true", help="Run the named stages (all if none) even if up to date")
+    parser.add_argument("--no-deps", action="store_true",
+                        help="Run only the named stages, using the existing outputs of their dependencies")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would run")
+    parser.add_argument("--parallel", type=int, default=2, help="Stages allowed to run at the same time")
+    args = parser.parse_args()
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    if args.no_deps and not args.stages:
+        parser.error("--no-deps needs at least one stage")
+    ok = run_pipeline(args.stages, force=args.force, dry_run=args.dry_run, max_parallel=args.parallel,
+                      with_deps=not args.no_deps)
+    sys.exit(0 if ok else 1)
 
 
 if __name__ == "__main__":
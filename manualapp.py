@@ -1,15 +1,27 @@
 import asyncio
+from collections import deque
 import sys
 import random
 import os
 from pathlib import Path
 from playwright.async_api import async_playwright
 from openpyxl import load_workbook
+from pack import packed_serials
+from metrics import metrics, start_metrics_server
+from validate import ExportValidator, quarantine, save_download, validate_export
+from workqueue import connect, default_worker_id
 
 PROJECT_ROOT = Path(__file__).parent
+METRICS_PORT = 9100  # Dashboard port (see metrics.py)
 DOWNLOADS_DIR = PROJECT_ROOT / "downloads"
 DOWNLOADS_DIR.mkdir(exist_ok=True)
 EXCEL_FILE = PROJECT_ROOT / "serials.xlsx"
+# Shared queue: coordinator URL (http://host:8700) or a local workqueue.db; unset = process serials.xlsx alone
+COORDINATOR = os.environ.get("PARTS_COORDINATOR")
+LEASE_CHUNK = 20  # Serials claimed per lease
+HEARTBEAT_SECONDS = 60
+RETRY_DELAYS = (5, 15, 60, 120, 300)  # Backoff between coordinator retries, e.g. while it restarts
+EXIT_INCOMPLETE = 3  # Run finished but some serials are still missing (main.py reruns the stage next time)
 
 # List of user-agents to rotate
 USER_AGENTS = [
@@ -18,6 +30,17 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
 ]
 
+def downloaded_serials() -> set:
+    """Serials with an export in downloads/ or already moved into the downloads pack."""
+    downloaded = set()
+    for file_path in DOWNLOADS_DIR.glob("PartsExport_Serial-*.xlsx"):
+        filename = file_path.name
+        parts = filename.split('_')
+        if len(parts) >= 2 and parts[1].startswith('Serial-'):
+            serial = parts[1][7:].upper()
+            downloaded.add(serial)
+    return downloaded | packed_serials()
+
 def load_serials_from_excel():
     # Load all serials from Excel
     all_serials = []
@@ -32,19 +55,11 @@ def load_serials_from_excel():
         print(f"✗ Error loading Excel file: {e}")
         sys.exit(1)
     
-    # Get list of already downloaded serials
-    downloaded_serials = set()
-    for file_path in DOWNLOADS_DIR.glob("PartsExport_Serial-*.xlsx"):
-        filename = file_path.name
-        parts = filename.split('_')
-        if len(parts) >= 2 and parts[1].startswith('Serial-'):
-            serial = parts[1][7:].upper()
-            downloaded_serials.add(serial)
-    
-    print(f"✓ Found {len(downloaded_serials)} already downloaded serials.")
+    downloaded = downloaded_serials()
+    print(f"✓ Found {len(downloaded)} already downloaded serials.")
     
     # Filter out downloaded ones
-    remaining_serials = [s for s in all_serials if s not in downloaded_serials]
+    remaining_serials = [s for s in all_serials if s not in downloaded]
     skipped = len(all_serials) - len(remaining_serials)
     print(f"✓ Skipping {skipped} downloaded serials. Processing {len(remaining_serials)} remaining.")
     
@@ -53,6 +68,8 @@ def load_serials_from_excel():
 async def download_lenovo_parts(serial: str, context, index: int, total: int) -> str:
     user_agent = random.choice(USER_AGENTS)
     page = await context.new_page()
+    metrics.add("in_flight_pages", 1)
+    phases = metrics.phase_timer()
     await page.set_extra_http_headers({"User-Agent": user_agent})
     
     try:
@@ -61,6 +78,7 @@ async def download_lenovo_parts(serial: str, context, index: int, total: int) ->
         print(f"Processing {index}/{total}: {serial} - Navigating to parts page")
         
         await page.goto(base_url, wait_until="domcontentloaded", timeout=60000)
+        phases.mark("navigate")
         # await asyncio.sleep(2)
 
         try:
@@ -94,6 +112,7 @@ async def download_lenovo_parts(serial: str, context, index: int, total: int) ->
         
         # Wait for navigation to the as-built page
         await page.wait_for_url("**/as-built", timeout=30000)
+        phases.mark("search")
         print("Navigated to as-built page")
 
         # Accept Evidon cookies
@@ -132,7 +151,8 @@ async def download_lenovo_parts(serial: str, context, index: int, total: int) ->
         filename = download.suggested_filename or f"{serial}_parts.xlsx"
         file_path = DOWNLOADS_DIR / filename
         
-        await download.save_as(file_path)
+        await save_download(download, file_path)
+        phases.mark("download")
         print(f"✓ Downloaded: {filename}")
         
         return filename
@@ -142,14 +162,88 @@ async def download_lenovo_parts(serial: str, context, index: int, total: int) ->
         return None
         
     finally:
+        metrics.add("in_flight_pages", -1)
         await page.close()
 
-async def main():
-    serials = load_serials_from_excel()
-    if not serials:
-        return
+async def call_coordinator(func, *args):
+    """Run a queue call off the event loop, retrying with backoff; raises after the last retry."""
+    for delay in RETRY_DELAYS + (None,):
+        try:
+            return await asyncio.to_thread(func, *args)
+        except Exception as e:
+            if delay is None:
+                raise
+            print(f"✗ {func.__name__} failed ({e}), retrying in {delay}s...")
+            await asyncio.sleep(delay)
+
+async def keep_lease_alive(client, lease_id, lost):
+    """Extend the lease every HEARTBEAT_SECONDS; sets lost once the coordinator no longer holds it for us."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        try:
+            held = await asyncio.to_thread(client.heartbeat, lease_id)
+        except Exception as e:
+            print(f"Heartbeat failed: {e}")
+            continue
+        if held == 0:
+            print("✗ Lease expired, its serials went back to the pool.")
+            lost.set()
+            return
+
+async def process_leased_serials(client, context):
+    """Claim serials from the shared queue in chunks until the pool is empty; returns how many failed here."""
+    worker = default_worker_id()
+    processed = 0
+    failed = 0
+    while True:
+        lease = await call_coordinator(client.claim, worker, LEASE_CHUNK)
+        if not lease["serials"]:
+            if lease["remaining"] == 0:
+                print("✓ Queue is empty.")
+                return failed
+            # Everything left is leased by other workers; wait for them or for their leases to expire
+            await asyncio.sleep(30)
+            continue
+        
+        lost = asyncio.Event()
+        heartbeat = asyncio.create_task(keep_lease_alive(client, lease["lease_id"], lost))
+        try:
+            for serial in lease["serials"]:
+                if lost.is_set():
+                    break  # The rest of the chunk may already be with another worker
+                processed += 1
+                metrics.set("serials_total", processed + lease["remaining"] - 1)
+                result = await download_lenovo_parts(serial, context, processed, processed + lease["remaining"] - 1)
+                file_path = DOWNLOADS_DIR / result if result else None
+                # Never report a broken export as done; a failure sends the serial back to the pool
+                error = await asyncio.to_thread(validate_export, file_path) if file_path else None
+                if error:
+                    print(f"✗ Invalid export for {serial} ({error})")
+                    quarantine(file_path)
+                    result, file_path = None, None
+                metrics.serial_finished(bool(result))
+                if not result:
+                    failed += 1
+                try:
+                    status = await call_coordinator(client.complete, lease["lease_id"], serial, bool(result), file_path)
+                except Exception as e:
+                    # The lease expires on the coordinator and the serial is handed out again
+                    print(f"✗ Could not report {serial}: {e}")
+                    continue
+                print(f"Reported {serial}: {status}")
+        finally:
+            heartbeat.cancel()
+
+async def main() -> int:
+    """Returns how many serials are still not downloaded (0 = all done)."""
+    client = connect(COORDINATOR) if COORDINATOR else None
+    serials = [] if client else load_serials_from_excel()
+    if not client and not serials:
+        return 0
     
     total = len(serials)
+    start_metrics_server(METRICS_PORT)
+    metrics.set("serials_total", total)
     async with async_playwright() as p:
         user_data_dir = PROJECT_ROOT / "lenovo_cookies"
         context = await p.chromium.launch_persistent_context(
@@ -169,19 +263,48 @@ async def main():
         os.system('osascript -e \'tell application "Google Chrome for Testing" to set frontmost of frontmost to false\'')
         print("Browser window minimized and sent to background.")
         
+        if client:
+            return await process_leased_serials(client, context)
+        
+        # Saved files are checked in the background; broken ones come back onto the queue.
+        # A serial counts as done on the dashboard only once its export passed the check.
+        validator = ExportValidator(on_done=lambda serial, ok: metrics.serial_finished(ok))
+        queue = deque(serials)
         successes = 0
         failures = 0
-        for i, serial in enumerate(serials, 1):
+        i = 0
+        while queue:
+            serial = queue.popleft()
+            i += 1
             result = await download_lenovo_parts(serial, context, i, total)
             if result:
                 successes += 1
+                validator.submit(serial, DOWNLOADS_DIR / result)
             else:
                 failures += 1
+                metrics.serial_finished(False)
+            requeued = validator.requeue(queue)
+            if not queue:
+                # Wait for the last checks before deciding the run is over
+                await asyncio.to_thread(validator.wait)
+                requeued += validator.requeue(queue)
+            if requeued:
+                # Same serials again: the progress counter grows, the dashboard's serial total does not
+                total += requeued
+                metrics.inc("exports_requeued", requeued)
             
             # Delay between serials
             # if i < total:
             #     print("Waiting 5s before next serial...")
             #     await asyncio.sleep(5)
+    
+    downloaded = downloaded_serials()
+    missing = len({s for s in serials if s not in downloaded})
+    if missing:
+        print(f"✗ {missing} serials are still not downloaded; run again to retry them.")
+    return missing
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # Distinct exit code while serials are missing: main.py still merges what was downloaded,
+    # but does not record the download stage as up to date
+    sys.exit(EXIT_INCOMPLETE if asyncio.run(main()) else 0)
\ No newline at end of file
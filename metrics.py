@@ -0,0 +1,230 @@
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from flask import Flask, Response, jsonify, render_template_string
+from werkzeug.serving import make_server
+
+# Local port for /metrics and the dashboard. Each scraper has its own default so they can run side
+# by side; PARTS_METRICS_PORT overrides it for all of them and PARTS_METRICS_PORT=0 turns the server off
+METRICS_PORT = int(os.environ["PARTS_METRICS_PORT"]) if os.environ.get("PARTS_METRICS_PORT") else None
+PORT_ATTEMPTS = 10  # If the port is taken, try the next ones
+RATE_WINDOW = 5 * 60  # Seconds of completions used for the rate and ETA
+BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+DASHBOARD = """
+<!doctype html>
+<html>
+  <head><meta charset="utf-8"><title>Scraper</title></head>
+  <body style="font-family: sans-serif; max-width: 860px; margin: 2rem auto;">
+    <h1>Scraper <small id="uptime" style="color:#555;"></small></h1>
+    <table id="summary" style="border-collapse: collapse; margin-bottom: 1.5rem;"></table>
+    <h2>Phase latency</h2>
+    <table id="phases" style="border-collapse: collapse;"></table>
+    <p style="color:#555;">Raw: <a href="/metrics">/metrics</a> · <a href="/metrics.json">/metrics.json</a></p>
+    <script>
+      const fmt = s => s == null ? "–" : s >= 3600 ? (s / 3600).toFixed(1) + " h" : s >= 60 ? (s / 60).toFixed(1) + " min" : s.toFixed(1) + " s";
+      const row = cells => "<tr>" + cells.map(c => `<td style="padding:.25rem 1rem .25rem 0;">${c}</td>`).join("") + "</tr>";
+      async function refresh() {
+        const m = await (await fetch("/metrics.json")).json();
+        document.getElementById("uptime").textContent = "up " + fmt(m.uptime_seconds);
+        document.getElementById("summary").innerHTML = [
+          ["Done", m.counters.serials_done || 0], ["Failed", m.counters.serials_failed || 0],
+          ["Total", m.gauges.serials_total ?? "–"], ["Rate", m.rate_per_minute.toFixed(1) + " / min"],
+          ["ETA", fmt(m.eta_seconds)], ["In-flight pages", m.gauges.in_flight_pages || 0],
+          ["Context restarts", m.counters.context_restarts || 0], ["Requeued exports", m.counters.exports_requeued || 0],
+          ["Browser RSS", m.browser_rss_bytes == null ? "–" : (m.browser_rss_bytes / 1048576).toFixed(0) + " MB"],
+        ].map(row).join("");
+        document.getElementById("phases").innerHTML = row(["<b>Phase</b>", "<b>Count</b>", "<b>Avg</b>", "<b>Max</b>"]) +
+          Object.entries(m.phases).map(([name, h]) => row([name, h.count, fmt(h.sum / h.count), fmt(h.max)])).join("");
+      }
+      refresh();
+      setInterval(refresh, 5000);
+    </script>
+  </body>
+</html>
+"""
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+class Metrics:
+    """In-process counters, gauges and per-phase latency histograms, safe to use from any thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.phases = {}
+        self.completions = deque()
+
+    def inc(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def add(self, name, value):
+        with self.lock:
+            self.gauges[name] = self.gauges.get(name, 0) + value
+
+    def observe(self, phase, seconds):
+        with self.lock:
+            self.phases.setdefault(phase, Histogram()).observe(seconds)
+
+    def serial_finished(self, ok: bool):
+        self.inc("serials_done" if ok else "serials_failed")
+        with self.lock:
+            self.completions.append(time.time())
+
+    def phase_timer(self):
+        return PhaseTimer(self)
+
+    def rate_per_minute(self) -> float:
+        now = time.time()
+        with self.lock:
+            while self.completions and self.completions[0] < now - RATE_WINDOW:
+                self.completions.popleft()
+            recent = len(self.completions)
+        window = min(RATE_WINDOW, max(now - self.started, 1))
+        return recent * 60 / window
+
+    def snapshot(self) -> dict:
+        rate = self.rate_per_minute()
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            phases = {name: {"count": h.count, "sum": h.sum, "max": h.max,
+                             "buckets": dict(zip(BUCKETS, h.counts))} for name, h in self.phases.items()}
+        eta = None
+        if "serials_total" in gauges and rate > 0:
+            left = gauges["serials_total"] - counters.get("serials_done", 0) - counters.get("serials_failed", 0)
+            eta = max(left, 0) * 60 / rate
+        return {"uptime_seconds": time.time() - self.started, "counters": counters, "gauges": gauges,
+                "rate_per_minute": rate, "eta_seconds": eta, "browser_rss_bytes": browser_rss_bytes(),
+                "phases": phases}
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition of the snapshot."""
+        snap = self.snapshot()
+        lines = []
+        for name, value in sorted(snap["counters"].items()):
+            lines += [f"# TYPE scraper_{name}_total counter", f"scraper_{name}_total {value}"]
+        for name, value in sorted(snap["gauges"].items()):
+            lines += [f"# TYPE scraper_{name} gauge", f"scraper_{name} {value}"]
+        lines += ["# TYPE scraper_rate_per_minute gauge", f"scraper_rate_per_minute {snap['rate_per_minute']:.3f}"]
+        if snap["eta_seconds"] is not None:
+            lines += ["# TYPE scraper_eta_seconds gauge", f"scraper_eta_seconds {snap['eta_seconds']:.0f}"]
+        if snap["browser_rss_bytes"] is not None:
+            lines += ["# TYPE scraper_browser_rss_bytes gauge", f"scraper_browser_rss_bytes {snap['browser_rss_bytes']}"]
+        lines.append("# TYPE scraper_phase_seconds histogram")
+        for phase, h in sorted(snap["phases"].items()):
+            for bound, count in h["buckets"].items():
+                lines.append(f'scraper_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {count}')
+            lines.append(f'scraper_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {h["count"]}')
+            lines.append(f'scraper_phase_seconds_sum{{phase="{phase}"}} {h["sum"]:.3f}')
+            lines.append(f'scraper_phase_seconds_count{{phase="{phase}"}} {h["count"]}')
+        return "\n".join(lines) + "\n"
+
+class PhaseTimer:
+    """Records the time since the previous mark: timer.mark("navigate") ... timer.mark("search")."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.metrics.observe(phase, now - self.last)
+        self.last = now
+
+def browser_rss_bytes() -> int | None:
+    """Resident memory of all descendants of this process (the browser), read from /proc; None elsewhere."""
+    proc = Path("/proc")
+    if not proc.exists():
+        return None
+    parents, rss = {}, {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+            fields = stat[stat.rindex(")") + 2:].split()
+            parents[int(entry.name)] = int(fields[1])
+            rss[int(entry.name)] = int(fields[21]) * page_size
+        except (OSError, ValueError, IndexError):
+            continue
+    children = {}
+    for pid, ppid in parents.items():
+        children.setdefault(ppid, []).append(pid)
+    total, todo = 0, list(children.get(os.getpid(), []))
+    while todo:
+        pid = todo.pop()
+        total += rss.get(pid, 0)
+        todo.extend(children.get(pid, []))
+    return total
+
+metrics = Metrics()
+
+def create_app(m: Metrics = metrics) -> Flask:
+    app = Flask(__name__)
+
+    @app.get("/")
+    def dashboard():
+        return render_template_string(DASHBOARD)
+
+    @app.get("/metrics")
+    def prometheus():
+        return Response(m.prometheus(), mimetype="text/plain; version=0.0.4")
+
+    @app.get("/metrics.json")
+    def snapshot():
+        return jsonify(m.snapshot())
+
+    return app
+
+def start_metrics_server(port=9100, host="127.0.0.1"):
+    """Serve the dashboard and /metrics from a daemon thread on the first free port from port on.
+
+    Returns the server (None if disabled or no port was free).
+    """
+    if METRICS_PORT is not None:
+        port = METRICS_PORT
+    if not port:
+        return None
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # Keep request logs out of the scraper output
+    error = None
+    for candidate in range(port, port + PORT_ATTEMPTS):
+        # Probe first: werkzeug prints to stderr and exits the process when the port is taken
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+                probe.bind((host, candidate))
+            server = make_server(host, candidate, create_app(), threaded=True)
+        except (OSError, SystemExit) as e:
+            error = e
+            continue
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        print(f"✓ Metrics on http://{host}:{candidate}/ (Prometheus: /metrics)")
+        return server
+    print(f"✗ Metrics server not started on {host}:{port}-{port + PORT_ATTEMPTS - 1}: {error}")
+    return None
@@ -1,12 +1,21 @@
 import asyncio
+import codecs
 import io
 import mimetypes
 import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
 from pathlib import Path
 from urllib.parse import urlparse, urljoin
 
 import requests
-from flask import Flask, request, send_file, render_template_string, abort
+from flask import Flask, Response, request, send_file, render_template_string, abort, jsonify
 from playwright.async_api import async_playwright
 
 PROJECT_ROOT = Path(__file__).parent
@@ -23,10 +32,37 @@ HTML = """
       <button type="submit" style="padding:.5rem 1rem;">Download image</button>
     </form>
     <p style="color:#555; margin-top:1rem;">Paste a direct image link or a page containing an image (og:image or the first &lt;img&gt;).</p>
+    <h2>Batch</h2>
+    <form method="post" action="/batch" style="display:flex; flex-direction:column; gap:.5rem;">
+      <textarea name="urls" rows="8" placeholder="One URL per line" required style="padding:.5rem;"></textarea>
+      <button type="submit" style="padding:.5rem 1rem; align-self:flex-start;">Start batch</button>
+    </form>
+    <p style="color:#555;">Returns a job id. Poll <code>/batch/&lt;id&gt;</code> for status, get the images from <code>/batch/&lt;id&gt;/zip</code>.</p>
   </body>
 </html>
 """
 
+HEAD_CHUNK_SIZE = 8192
+HEAD_MAX_BYTES = 512 * 1024  # Give up on the fast path if <head> is absurdly large
+
+# Pooled HTTP client shared by page and image fetches (keep-alive between requests)
+http = requests.Session()
+http.mount("https://", requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16))
+http.mount("http://", requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+BATCH_WORKERS = 16
+PER_HOST_LIMIT = 4  # Concurrent requests to any single host
+BROWSER_LIMIT = 2  # Concurrent Chromium fallbacks
+BATCH_MAX_URLS = 1000
+JOB_TTL = 60 * 60  # Seconds to keep finished jobs and their files around
+
+batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+browser_slots = threading.BoundedSemaphore(BROWSER_LIMIT)
+host_slots = {}
+host_slots_lock = threading.Lock()
+jobs = {}
+jobs_lock = threading.Lock()
+
 IMAGE_EXT_RE = re.compile(r"\.(jpg|jpeg|png|gif|webp|bmp|tiff)$", re.IGNORECASE)
 
 def is_likely_image_url(url: str) -> bool:
@@ -56,7 +92,7 @@ def fetch_image_bytes(url: str, referer: str | None = None) -> tuple[bytes, str,
     if referer:
         headers["Referer"] = referer
     
-    resp = requests.get(url, headers=headers, timeout=25)
+    resp = http.get(url, headers=headers, timeout=25)
     if resp.status_code != 200:
         abort(400, description=f"Failed to fetch image: HTTP {resp.status_code}")
     content_type = resp.headers.get("Content-Type", "")
@@ -64,6 +100,68 @@ def fetch_image_bytes(url: str, referer: str | None = None) -> tuple[bytes, str,
     fname = filename_from_url(url, content_type)
     return data, content_type, fname
 
+class HeadImageParser(HTMLParser):
+    """Collect og:image / twitter:image / link rel=image_src from <head>, stopping early."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.candidates = {}
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k.lower(): (v or "") for k, v in attrs}
+        if tag == "meta":
+            key = (attrs.get("property") or attrs.get("name") or "").strip().lower()
+            if key in ("og:image", "og:image:url", "og:image:secure_url", "twitter:image", "twitter:image:src"):
+                content = attrs.get("content", "").strip()
+                if content:
+                    self.candidates.setdefault(key.split(":")[0], content)
+        elif tag == "link" and "image_src" in attrs.get("rel", "").lower().split():
+            href = attrs.get("href", "").strip()
+            if href:
+                self.candidates.setdefault("image_src", href)
+        elif tag == "body":
+            self.done = True
+        # og:image is the preferred source, no need to read further once we have it
+        if "og" in self.candidates:
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self.done = True
+
+    def best(self) -> str | None:
+        for key in ("og", "twitter", "image_src"):
+            if key in self.candidates:
+                return self.candidates[key]
+        return None
+
+def extract_image_url_from_html(page_url: str) -> str | None:
+    """Fast path: stream the raw HTML and read the image from <head> without a browser."""
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    }
+    try:
+        with http.get(page_url, headers=headers, timeout=15, stream=True) as resp:
+            content_type = resp.headers.get("Content-Type", "html")
+            if resp.status_code != 200 or "html" not in content_type:
+                return None
+            parser = HeadImageParser()
+            # requests reports ISO-8859-1 for text/html without a charset; such pages are almost always UTF-8
+            encoding = resp.encoding if "charset=" in content_type.lower() else "utf-8"
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            read = 0
+            for chunk in resp.iter_content(chunk_size=HEAD_CHUNK_SIZE):
+                parser.feed(decoder.decode(chunk))
+                read += len(chunk)
+                if parser.done or read >= HEAD_MAX_BYTES:
+                    break
+            found = parser.best()
+            return urljoin(resp.url, found) if found else None
+    except (requests.RequestException, LookupError):  # LookupError: unknown charset in the header
+        return None
+
 async def extract_image_url(page_url: str) -> str | None:
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
@@ -88,6 +186,101 @@ async def extract_image_url(page_url: str) -> str | None:
         finally:
             await browser.close()
 
+def resolve_image_url(page_url: str) -> str | None:
+    """Try the raw-HTML fast path first; launch the browser only if <head> had nothing."""
+    img_url = extract_image_url_from_html(page_url)
+    if img_url:
+        return img_url
+    with browser_slots:
+        return asyncio.run(extract_image_url(page_url))
+
+def host_slot(url: str) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc.lower()
+    with host_slots_lock:
+        if host not in host_slots:
+            host_slots[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return host_slots[host]
+
+def process_batch_item(job: dict, item: dict):
+    """Resolve and download one URL of a batch job into the job's temp directory."""
+    url = item["url"]
+    item["status"] = "running"
+    try:
+        img_url, referer = url, None
+        if not is_likely_image_url(url):
+            with host_slot(url):
+                img_url = resolve_image_url(url)
+            if not img_url:
+                raise ValueError("No image found on the page.")
+            referer = url
+        with host_slot(img_url):
+            data, _, fname = fetch_image_bytes(img_url, referer=referer)
+        item["name"] = f"{item['index']:04d}_{fname}"
+        path = job["dir"] / item["name"]
+        path.write_bytes(data)
+        item["path"] = path
+        item["status"] = "done"
+    except Exception as e:
+        item["error"] = getattr(e, "description", None) or str(e)
+        item["status"] = "failed"
+
+def item_finished(job: dict):
+    with jobs_lock:
+        job["left"] -= 1
+        if job["left"] == 0:
+            job["finished"] = time.time()
+
+def expire_jobs():
+    """Drop jobs that finished more than JOB_TTL ago; jobs still running are kept whatever their age."""
+    now = time.time()
+    with jobs_lock:
+        expired = [job_id for job_id, job in jobs.items() if job["finished"] and now - job["finished"] > JOB_TTL]
+        dropped = [jobs.pop(job_id) for job_id in expired]
+    for job in dropped:
+        for future in job["futures"]:
+            future.cancel()
+        shutil.rmtree(job["dir"], ignore_errors=True)
+
+class ZipChunkWriter:
+    """Unseekable file-like object that collects zip output so it can be yielded in chunks."""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_job_zip(job: dict):
+    """Yield the ZIP for a job entry by entry, waiting on each URL in order."""
+    out = ZipChunkWriter()
+    failures = []
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf:
+        for item, future in zip(job["items"], job["futures"]):
+            future.result()
+            if item["status"] == "done":
+                # Images are already compressed; store them and copy straight from disk
+                zf.write(item["path"], arcname=item["name"])
+            else:
+                failures.append(f"{item['url']}\t{item.get('error', '')}")
+            yield out.drain()
+        if failures:
+            zf.writestr("failed.txt", "\n".join(failures) + "\n")
+    yield out.drain()
+
 @app.get("/")
 def index():
     return render_template_string(HTML)
@@ -105,12 +298,71 @@ def download():
                          as_attachment=True, download_name=fname)
 
     # Otherwise try to extract an image from the page
-    img_url = asyncio.run(extract_image_url(url))
+    img_url = resolve_image_url(url)
     if not img_url:
         abort(404, description="No image found on the page.")
     data, content_type, fname = fetch_image_bytes(img_url, referer=url)
     return send_file(io.BytesIO(data), mimetype=content_type or "application/octet-stream",
                      as_attachment=True, download_name=fname)
 
+@app.post("/batch")
+def create_batch():
+    payload = request.get_json(silent=True)
+    if payload is None:
+        urls = request.form.get("urls", "").splitlines()
+    else:
+        urls = payload.get("urls") if isinstance(payload, dict) else None
+        if not isinstance(urls, list) or not all(isinstance(u, str) for u in urls):
+            abort(400, description='Expected JSON {"urls": [...]} with a list of URL strings.')
+    urls = [u.strip() for u in urls if u and u.strip()]
+    if not urls:
+        abort(400, description="At least one URL is required.")
+    if len(urls) > BATCH_MAX_URLS:
+        abort(400, description=f"At most {BATCH_MAX_URLS} URLs per batch.")
+
+    expire_jobs()
+    job_id = uuid.uuid4().hex
+    job = {
+        "id": job_id,
+        "created": time.time(),
+        "finished": None,
+        "left": len(urls),
+        "dir": Path(tempfile.mkdtemp(prefix=f"batch-{job_id}-")),
+        "items": [{"index": i, "url": u, "status": "queued"} for i, u in enumerate(urls, 1)],
+    }
+    job["futures"] = [batch_pool.submit(process_batch_item, job, item) for item in job["items"]]
+    for future in job["futures"]:
+        future.add_done_callback(lambda _: item_finished(job))
+    with jobs_lock:
+        jobs[job_id] = job
+    return jsonify(job_id=job_id, total=len(urls), status_url=f"/batch/{job_id}", zip_url=f"/batch/{job_id}/zip"), 202
+
+def get_job(job_id: str) -> dict:
+    with jobs_lock:
+        job = jobs.get(job_id)
+    if not job:
+        abort(404, description="Unknown job id.")
+    return job
+
+@app.get("/batch/<job_id>")
+def batch_status(job_id):
+    job = get_job(job_id)
+    counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+    for item in job["items"]:
+        counts[item["status"]] += 1
+    return jsonify(
+        job_id=job_id,
+        total=len(job["items"]),
+        finished=counts["done"] + counts["failed"] == len(job["items"]),
+        counts=counts,
+        items=[{k: item[k] for k in ("url", "status", "name", "error") if k in item} for item in job["items"]],
+    )
+
+@app.get("/batch/<job_id>/zip")
+def batch_zip(job_id):
+    job = get_job(job_id)
+    return Response(stream_job_zip(job), mimetype="application/zip",
+                    headers={"Content-Disposition": f'attachment; filename="images-{job_id[:8]}.zip"'})
+
 if __name__ == "__main__":
     app.run(host="127.0.0.1", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,199 @@
+import argparse
+import csv
+import json
+import mmap
+import os
+import zlib
+from pathlib import Path
+from openpyxl import load_workbook
+
+PROJECT_ROOT = Path(__file__).parent
+DOWNLOADS_DIR = PROJECT_ROOT / "downloads"
+PACK_DIR = PROJECT_ROOT / "downloads_pack"
+INDEX_FILE = "index.csv"
+SHARD_MAX_BYTES = 16 * 1024 * 1024  # Start a new shard once the current one reaches this size
+INDEX_FIELDS = ["Serial", "Shard", "Offset", "Length", "Rows", "Source"]
+EXPORT_COLUMNS = 7  # Description ... Customer Serviceable; consumers skip rows shorter than this
+
+def fit_row(row) -> list:
+    """Cut empty cells past the export columns and pad short rows back to them (blank rows stay empty)."""
+    row = list(row)
+    while len(row) > EXPORT_COLUMNS and row[-1] is None:
+        row.pop()
+    if any(value is not None for value in row):
+        row += [None] * (EXPORT_COLUMNS - len(row))
+    else:
+        row = []
+    return row
+
+def serial_from_filename(filename: str) -> str | None:
+    """'PartsExport_Serial-06fm735_2026-...' -> '06FM735'."""
+    parts = filename.split('_')
+    if len(parts) >= 2 and parts[1].startswith('Serial-'):
+        return parts[1][7:].upper()
+    return None
+
+def load_index(pack_dir=PACK_DIR):
+    """Load the serial -> index entry mapping of a pack (empty if there is no pack)."""
+    index = {}
+    index_path = Path(pack_dir) / INDEX_FILE
+    if not index_path.exists():
+        return index
+    with open(index_path, 'r', newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            index[row["Serial"]] = {
+                "shard": row["Shard"],
+                "offset": int(row["Offset"]),
+                "length": int(row["Length"]),
+                "rows": int(row["Rows"]),
+                "source": row["Source"],
+            }
+    return index
+
+def packed_serials(pack_dir=PACK_DIR) -> set:
+    """Serials already stored in the pack; used as a skip list by the scrapers."""
+    return set(load_index(pack_dir))
+
+class PackReader:
+    """Random access to a pack: one serial's BOM rows are a single slice of an mmapped shard."""
+
+    def __init__(self, pack_dir=PACK_DIR):
+        self.pack_dir = Path(pack_dir)
+        self.index = load_index(self.pack_dir)
+        self._maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, serial):
+        return serial.upper() in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def _shard(self, name):
+        if name not in self._maps:
+            with open(self.pack_dir / name, 'rb') as f:
+                self._maps[name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[name]
+
+    def serials(self):
+        return list(self.index)
+
+    def rows(self, serial: str) -> list[tuple]:
+        """Return the data rows (without header) exported for a serial."""
+        entry = self.index[serial.upper()]
+        shard = self._shard(entry["shard"])
+        blob = shard[entry["offset"]:entry["offset"] + entry["length"]]
+        return [tuple(fit_row(row)) for row in json.loads(zlib.decompress(blob))]
+
+    def items(self, serials=None):
+        """Yield (serial, rows) for every packed serial (or only those in serials) in on-disk order."""
+        for serial, entry in sorted(self.index.items(), key=lambda kv: (kv[1]["shard"], kv[1]["offset"])):
+            if serials is None or serial in serials:
+                yield serial, self.rows(serial)
+
+    def close(self):
+        for m in self._maps.values():
+            m.close()
+        self._maps.clear()
+
+def read_export_rows(file_path) -> list[list]:
+    """Read the data rows of one PartsExport xlsx, cut to the export columns."""
+    wb = load_workbook(file_path, read_only=True)
+    rows = []
+    try:
+        for row in wb.active.iter_rows(min_row=2, values_only=True):
+            rows.append(fit_row(row))
+    finally:
+        wb.close()
+    return rows
+
+def write_index(index, pack_dir):
+    index_path = Path(pack_dir) / INDEX_FILE
+    tmp_path = index_path.with_suffix(".tmp")
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(INDEX_FIELDS)
+        for serial, e in sorted(index.items(), key=lambda kv: (kv[1]["shard"], kv[1]["offset"])):
+            writer.writerow([serial, e["shard"], e["offset"], e["length"], e["rows"], e["source"]])
+    os.replace(tmp_path, index_path)
+
+def pack_downloads(downloads_dir=DOWNLOADS_DIR, pack_dir=PACK_DIR, delete=False):
+    """Append every not-yet-packed export in downloads_dir to new shards of the pack."""
+    pack_dir = Path(pack_dir)
+    pack_dir.mkdir(exist_ok=True)
+    index = load_index(pack_dir)
+
+    # Latest export per serial (the timestamp in the filename sorts chronologically)
+    exports = {}
+    for file_path in sorted(Path(downloads_dir).glob("PartsExport_Serial-*.xlsx")):
+        serial = serial_from_filename(file_path.name)
+        if serial:
+            exports[serial] = file_path
+    todo = {s: p for s, p in exports.items() if s not in index}
+    print(f"✓ Found {len(exports)} exports, {len(index)} serials already packed, packing {len(todo)}.")
+
+    shard_no = len(list(pack_dir.glob("shard-*.bin")))
+    shard_file = None
+    packed = []
+    try:
+        for i, (serial, file_path) in enumerate(todo.items(), 1):
+            try:
+                rows = read_export_rows(file_path)
+            except Exception as e:
+                print(f"✗ Skipping unreadable {file_path.name}: {e}")
+                continue
+            blob = zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9)
+
+            if shard_file is None or shard_file.tell() + len(blob) > SHARD_MAX_BYTES:
+                if shard_file:
+                    shard_file.close()
+                shard_name = f"shard-{shard_no:03d}.bin"
+                shard_no += 1
+                shard_file = open(pack_dir / shard_name, 'wb')
+
+            index[serial] = {"shard": shard_name, "offset": shard_file.tell(), "length": len(blob),
+                             "rows": len(rows), "source": file_path.name}
+            shard_file.write(blob)
+            packed.append(file_path)
+            if i % 1000 == 0:
+                print(f"Packed {i}/{len(todo)}")
+    finally:
+        if shard_file:
+            shard_file.flush()
+            os.fsync(shard_file.fileno())
+            shard_file.close()
+        write_index(index, pack_dir)
+
+    print(f"✓ Packed {len(packed)} serials into {pack_dir} ({len(index)} total).")
+    if delete:
+        # Every export that is the source of a pack entry, including ones packed by earlier runs
+        removed = 0
+        for file_path in Path(downloads_dir).glob("PartsExport_Serial-*.xlsx"):
+            entry = index.get(serial_from_filename(file_path.name))
+            if entry and entry["source"] == file_path.name:
+                file_path.unlink()
+                removed += 1
+        print(f"✓ Removed {removed} packed xlsx files from {downloads_dir}.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack downloads/ PartsExport files into compressed shards.")
+    parser.add_argument("--downloads", default=DOWNLOADS_DIR, type=Path, help="Directory with PartsExport_*.xlsx files")
+    parser.add_argument("--pack", default=PACK_DIR, type=Path, help="Pack directory (shards + index.csv)")
+    parser.add_argument("--delete", action="store_true", help="Delete the xlsx files once they are packed")
+    parser.add_argument("--show", metavar="SERIAL", help="Print the packed rows of one serial and exit")
+    args = parser.parse_args()
+
+    if args.show:
+        with PackReader(args.pack) as reader:
+            for row in reader.rows(args.show):
+                print(row)
+        return
+    pack_downloads(args.downloads, args.pack, delete=args.delete)
+
+if __name__ == "__main__":
+    main()
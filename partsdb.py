@@ -0,0 +1,171 @@
+import argparse
+import csv
+import sqlite3
+from pathlib import Path
+from openpyxl import Workbook
+
+PROJECT_ROOT = Path(__file__).parent
+DB_FILE = PROJECT_ROOT / "parts.db"  # Indexed copy of the Состав sheet
+MODELS_CSV = PROJECT_ROOT / "models.csv"  # CSV file for models
+
+PART_COLUMNS = ["description", "commodity_type", "part_number", "installed_qty",
+                "mfg_part_number", "customer_serviceable"]
+# Same column order as the Состав sheet (plus Model)
+EXPORT_HEADER = ["Description", "Commodity Type", "Part Number", "Installed Qty", "MFG Part Number", None,
+                 "Customer Serviceable", "Serial", "Model"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS serials (
+    serial TEXT PRIMARY KEY,
+    source TEXT,
+    row_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS parts (
+    id INTEGER PRIMARY KEY,
+    serial TEXT NOT NULL,
+    description TEXT,
+    commodity_type TEXT,
+    part_number TEXT,
+    installed_qty INTEGER,
+    mfg_part_number TEXT,
+    customer_serviceable TEXT
+);
+CREATE TABLE IF NOT EXISTS models (
+    serial TEXT PRIMARY KEY,
+    model TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_parts_serial ON parts(serial);
+CREATE INDEX IF NOT EXISTS idx_parts_part_number ON parts(part_number);
+CREATE INDEX IF NOT EXISTS idx_models_model ON models(model);
+"""
+
+class PartsStore:
+    """SQLite store of BOM rows, serials and models, filled by combine.py."""
+
+    def __init__(self, db_file=DB_FILE):
+        self.conn = sqlite3.connect(db_file)
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.conn.commit()
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def add_serial(self, serial: str, rows, source: str | None = None):
+        """Replace the stored rows of a serial, so re-running combine never duplicates."""
+        serial = serial.strip().upper()
+        records = [(serial, desc, comm_type, part_num, qty, mfg_part, cust_serv)
+                   for desc, comm_type, part_num, qty, mfg_part, _, cust_serv in (row[:7] for row in rows if len(row) >= 7)]
+        self.conn.execute("DELETE FROM parts WHERE serial = ?", (serial,))
+        self.conn.executemany(
+            f"INSERT INTO parts (serial, {', '.join(PART_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+        self.conn.execute("INSERT OR REPLACE INTO serials (serial, source, row_count) VALUES (?, ?, ?)",
+                          (serial, source, len(records)))
+
+    def sources(self) -> dict:
+        """Serial -> export file its stored rows came from."""
+        return dict(self.conn.execute("SELECT serial, source FROM serials"))
+
+    def load_models(self, models_csv=MODELS_CSV):
+        """Load (or refresh) the Serial -> Model mapping from models.csv."""
+        models = []
+        with open(models_csv, 'r', newline='', encoding='utf-8') as csvfile:
+            for row in csv.DictReader(csvfile):
+                serial = row.get('Serial', '').strip().upper()
+                if serial:
+                    models.append((serial, row.get('Model', 'N/A')))
+        self.conn.executemany("INSERT OR REPLACE INTO models (serial, model) VALUES (?, ?)", models)
+        return len(models)
+
+    def commit(self):
+        self.conn.commit()
+
+    def query_rows(self, serial=None, part_number=None, model=None):
+        """Yield Состав-shaped rows filtered by serial, part number and/or model (substring)."""
+        where, params = [], []
+        if serial:
+            where.append("p.serial = ?")
+            params.append(serial.strip().upper())
+        if part_number:
+            where.append("p.part_number = ?")
+            params.append(part_number.strip())
+        if model:
+            where.append("m.model LIKE ?")
+            params.append(f"%{model}%")
+        sql = (f"SELECT p.description, p.commodity_type, p.part_number, p.installed_qty, p.mfg_part_number, NULL, "
+               f"p.customer_serviceable, p.serial, COALESCE(m.model, 'N/A') "
+               f"FROM parts p LEFT JOIN models m ON m.serial = p.serial")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        yield from self.conn.execute(sql + " ORDER BY p.serial, p.id", params)
+
+    def serials_with_part(self, part_number: str) -> list[str]:
+        cur = self.conn.execute("SELECT DISTINCT serial FROM parts WHERE part_number = ? ORDER BY serial",
+                                (part_number.strip(),))
+        return [serial for (serial,) in cur]
+
+    def counts_per_model(self) -> list[tuple]:
+        """(model, serials, part rows) for every model, most serials first."""
+        cur = self.conn.execute(
+            "SELECT COALESCE(m.model, 'N/A'), COUNT(*), SUM(s.row_count) "
+            "FROM serials s LEFT JOIN models m ON m.serial = s.serial "
+            "GROUP BY 1 ORDER BY 2 DESC")
+        return cur.fetchall()
+
+def export_xlsx(store: PartsStore, out_file, **filters) -> int:
+    """Write a filtered slice to a small xlsx with the Состав layout; returns the row count."""
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet("Состав")
+    sheet.append(EXPORT_HEADER)
+    count = 0
+    for row in store.query_rows(**filters):
+        sheet.append(list(row))
+        count += 1
+    wb.save(out_file)
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the parts store written by combine.py.")
+    parser.add_argument("--db", default=DB_FILE, type=Path, help="SQLite file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("part", help="Serials containing a part number")
+    p.add_argument("part_number")
+    p = sub.add_parser("serial", help="BOM rows of one serial")
+    p.add_argument("serial")
+    sub.add_parser("models", help="Serial and row counts per model")
+    sub.add_parser("load-models", help="Refresh the models table from models.csv")
+    p = sub.add_parser("export", help="Export a filtered slice to xlsx")
+    p.add_argument("out_file", type=Path)
+    p.add_argument("--serial")
+    p.add_argument("--part", dest="part_number")
+    p.add_argument("--model", help="Substring of the model name")
+    args = parser.parse_args()
+
+    with PartsStore(args.db) as store:
+        if args.command == "part":
+            serials = store.serials_with_part(args.part_number)
+            for serial in serials:
+                print(serial)
+            print(f"✓ {len(serials)} serials contain {args.part_number}")
+        elif args.command == "serial":
+            for row in store.query_rows(serial=args.serial):
+                print(row)
+        elif args.command == "models":
+            for model, serials, rows in store.counts_per_model():
+                print(f"{serials:6d} serials {rows or 0:8d} rows  {model}")
+        elif args.command == "load-models":
+            print(f"✓ Loaded {store.load_models()} models from {MODELS_CSV}")
+        elif args.command == "export":
+            count = export_xlsx(store, args.out_file, serial=args.serial,
+                                part_number=args.part_number, model=args.model)
+            print(f"✓ Exported {count} rows to {args.out_file}")
+
+if __name__ == "__main__":
+    main()
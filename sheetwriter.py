@@ -0,0 +1,149 @@
+import csv
+import os
+from itertools import groupby
+from pathlib import Path
+from openpyxl import Workbook, load_workbook
+
+EXCEL_MAX_ROWS = 1_048_576
+DEFAULT_MAX_ROWS = 1_000_000  # Rows per shard (header included), leaves headroom below the xlsx limit
+MANIFEST_FIELDS = ["File", "Sheet", "Serial", "Rows"]
+
+def shard_sheet_name(sheet_name: str, n: int) -> str:
+    """Состав, Состав_2, Состав_3, ..."""
+    return sheet_name if n == 1 else f"{sheet_name}_{n}"
+
+def shard_file_name(out_file: Path, n: int) -> Path:
+    """output.xlsx, output_2.xlsx, output_3.xlsx, ..."""
+    return out_file if n == 1 else out_file.with_name(f"{out_file.stem}_{n}{out_file.suffix}")
+
+def manifest_path(out_file) -> Path:
+    out_file = Path(out_file)
+    return out_file.with_name(f"{out_file.stem}_manifest.csv")
+
+def read_manifest(out_file) -> list[dict]:
+    path = manifest_path(out_file)
+    if not path.exists():
+        return []
+    with open(path, 'r', newline='', encoding='utf-8') as csvfile:
+        return list(csv.DictReader(csvfile))
+
+def list_shards(out_file, sheet_name: str) -> list[tuple[Path, str]]:
+    """(file, sheet) of every shard, in order; falls back to the single sheet when there is no manifest."""
+    out_file = Path(out_file)
+    shards = []
+    for row in read_manifest(out_file):
+        shard = (out_file.with_name(row["File"]), row["Sheet"])
+        if shard not in shards:
+            shards.append(shard)
+    return shards or [(out_file, sheet_name)]
+
+def iter_shard_rows(out_file, sheet_name: str, min_row: int = 1):
+    """Stream the rows of every shard (read-only); min_row=2 skips each shard's header."""
+    for file_path, sheet in list_shards(out_file, sheet_name):
+        if not file_path.exists():
+            continue
+        wb = load_workbook(file_path, read_only=True)
+        try:
+            if sheet in wb.sheetnames:
+                for row in wb[sheet].iter_rows(min_row=min_row, values_only=True):
+                    if any(value is not None for value in row):
+                        yield row
+        finally:
+            wb.close()
+
+def read_header(out_file, sheet_name: str):
+    """Header row of the first shard, or None if the sheet is missing or empty."""
+    file_path, sheet = list_shards(out_file, sheet_name)[0]
+    if not file_path.exists():
+        return None
+    wb = load_workbook(file_path, read_only=True)
+    try:
+        if sheet not in wb.sheetnames:
+            return None
+        return next(wb[sheet].iter_rows(max_row=1, values_only=True), None)
+    finally:
+        wb.close()
+
+def group_rows_by_serial(rows, serial_index: int):
+    """Group consecutive rows by the serial column so a serial is written as one block."""
+    for serial, group in groupby(rows, key=lambda row: row[serial_index] if len(row) > serial_index else None):
+        yield serial, list(group)
+
+class ShardedSheetWriter:
+    """Write-only sheet writer that rolls over to a new sheet or file before max_rows.
+
+    A serial's rows always land in one shard. On close every shard is saved next to
+    out_file and a manifest (<stem>_manifest.csv) records which serials live where.
+    Pass workbook to write the first shard into a write-only workbook that already
+    has other sheets in it.
+    """
+
+    def __init__(self, out_file, header, sheet_name="Состав", max_rows=DEFAULT_MAX_ROWS,
+                 split_files=False, workbook=None):
+        if not 1 < max_rows <= EXCEL_MAX_ROWS:
+            raise ValueError(f"max_rows must be between 2 and {EXCEL_MAX_ROWS}")
+        self.out_file = Path(out_file)
+        self.header = list(header)
+        self.sheet_name = sheet_name
+        self.max_rows = max_rows
+        self.split_files = split_files
+        self.shard_no = 0
+        self.wb = workbook or Workbook(write_only=True)
+        self.saved = []  # (tmp path, final path) of every finished workbook
+        self.manifest = []
+        self.total_rows = 0
+        self._new_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+
+    def _file(self):
+        return shard_file_name(self.out_file, self.shard_no if self.split_files else 1)
+
+    def _save_current(self):
+        final = self._file()
+        tmp = final.with_name(f"{final.stem}.tmp{final.suffix}")
+        self.wb.save(tmp)
+        self.saved.append((tmp, final))
+
+    def _new_shard(self):
+        if self.shard_no and self.split_files:
+            self._save_current()
+            self.wb = Workbook(write_only=True)
+        self.shard_no += 1
+        self.sheet_title = self.sheet_name if self.split_files else shard_sheet_name(self.sheet_name, self.shard_no)
+        self.sheet = self.wb.create_sheet(self.sheet_title)
+        self.sheet.append(self.header)
+        self.rows_in_shard = 1
+
+    def write_serial(self, serial, rows):
+        rows = list(rows)
+        if 1 + len(rows) > EXCEL_MAX_ROWS:
+            raise ValueError(f"Serial {serial} has {len(rows)} rows, more than one sheet can hold")
+        if self.rows_in_shard > 1 and self.rows_in_shard + len(rows) > self.max_rows:
+            self._new_shard()
+        for row in rows:
+            self.sheet.append(list(row))
+        self.rows_in_shard += len(rows)
+        self.total_rows += len(rows)
+        self.manifest.append([self._file().name, self.sheet_title, serial, len(rows)])
+
+    def close(self):
+        self._save_current()
+        old_files = {self.out_file.with_name(row["File"]) for row in read_manifest(self.out_file)}
+        for tmp, final in self.saved:
+            os.replace(tmp, final)
+        # Drop shard files left over from a previous, bigger run
+        for stale in old_files - {final for _, final in self.saved}:
+            if stale != self.out_file and stale.exists():
+                stale.unlink()
+
+        with open(manifest_path(self.out_file), 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(MANIFEST_FIELDS)
+            writer.writerows(self.manifest)
+        return self.shard_no
@@ -1,11 +1,16 @@
 import asyncio
+from collections import deque
 import sys
 import random
 from pathlib import Path
 from playwright.async_api import async_playwright
 from openpyxl import load_workbook
+from pack import packed_serials
+from metrics import metrics, start_metrics_server
+from validate import ExportValidator, save_download
 
 PROJECT_ROOT = Path(__file__).parent
+METRICS_PORT = 9102  # Dashboard port (see metrics.py)
 DOWNLOADS_DIR = PROJECT_ROOT / "downloads"
 DOWNLOADS_DIR.mkdir(exist_ok=True)
 EXCEL_FILE = PROJECT_ROOT / "serials.xlsx"
@@ -40,6 +45,9 @@ def load_serials_from_excel():
             serial = parts[1][7:].upper()
             downloaded_serials.add(serial)
     
+    # Serials already moved into the downloads pack count as downloaded too
+    downloaded_serials |= packed_serials()
+    
     print(f"✓ Found {len(downloaded_serials)} already downloaded serials.")
     
     # Filter out downloaded ones
@@ -52,6 +60,8 @@ def load_serials_from_excel():
 async def download_lenovo_parts(serial: str, context, index: int, total: int) -> str:
     user_agent = random.choice(USER_AGENTS)
     page = await context.new_page()
+    metrics.add("in_flight_pages", 1)
+    phases = metrics.phase_timer()
     await page.set_extra_http_headers({"User-Agent": user_agent})
     
     try:
@@ -59,6 +69,7 @@ async def download_lenovo_parts(serial: str, context, index: int, total: int) ->
         print(f"Processing {index}/{total}: {serial}")
         
         response = await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+        phases.mark("navigate")
         if response and response.url.endswith("pagenotfound"):
             print(f"✗ Redirected to not found for {serial}.")
             return None
@@ -90,7 +101,8 @@ async def download_lenovo_parts(serial: str, context, index: int, total: int) ->
         filename = download.suggested_filename or f"{serial}_parts.xlsx"
         file_path = DOWNLOADS_DIR / filename
         
-        await download.save_as(file_path)
+        await save_download(download, file_path)
+        phases.mark("download")
         print(f"✓ Downloaded: {filename}")
         
         return filename
@@ -100,6 +112,7 @@ async def download_lenovo_parts(serial: str, context, index: int, total: int) ->
         return None
         
     finally:
+        metrics.add("in_flight_pages", -1)
         await page.close()
 
 async def main():
@@ -108,6 +121,8 @@ async def main():
         return
     
     total = len(serials)
+    start_metrics_server(METRICS_PORT)
+    metrics.set("serials_total", total)
     async with async_playwright() as p:
         user_data_dir = PROJECT_ROOT / "lenovo_cookies"
         context = await p.chromium.launch_persistent_context(
@@ -116,14 +131,32 @@ async def main():
             accept_downloads=True
         )
         
+        # Saved files are checked in the background; broken ones come back onto the queue.
+        # A serial counts as done on the dashboard only once its export passed the check.
+        validator = ExportValidator(on_done=lambda serial, ok: metrics.serial_finished(ok))
+        queue = deque(serials)
         successes = 0
         failures = 0
-        for i, serial in enumerate(serials, 1):
+        i = 0
+        while queue:
+            serial = queue.popleft()
+            i += 1
             result = await download_lenovo_parts(serial, context, i, total)
             if result:
                 successes += 1
+                validator.submit(serial, DOWNLOADS_DIR / result)
             else:
                 failures += 1
+                metrics.serial_finished(False)
+            requeued = validator.requeue(queue)
+            if not queue:
+                # Wait for the last checks before deciding the run is over
+                await asyncio.to_thread(validator.wait)
+                requeued += validator.requeue(queue)
+            if requeued:
+                # Same serials again: the progress counter grows, the dashboard's serial total does not
+                total += requeued
+                metrics.inc("exports_requeued", requeued)
             
             # Delay between serials
             if i < total:
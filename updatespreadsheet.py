@@ -1,7 +1,8 @@
 import csv
 import logging
 from pathlib import Path
-from openpyxl import load_workbook
+from openpyxl import Workbook, load_workbook
+from sheetwriter import DEFAULT_MAX_ROWS, ShardedSheetWriter, group_rows_by_serial, iter_shard_rows, list_shards, read_header
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -10,6 +11,7 @@ logger = logging.getLogger(__name__)
 PROJECT_ROOT = Path(__file__).parent
 EXCEL_FILE = PROJECT_ROOT / "output.xlsx"  # The existing mega file with parts data
 MODELS_CSV = PROJECT_ROOT / "models.csv"  # CSV file for models
+MAX_ROWS_PER_SHARD = DEFAULT_MAX_ROWS  # Состав rolls over to Состав_2... at this many rows
 
 def load_models_from_csv():
     """Load models from CSV."""
@@ -29,47 +31,59 @@ def load_models_from_csv():
     return models
 
 def update_excel_with_models(models):
-    """Update the Excel file with models."""
+    """Stream every Состав shard into a new workbook with the Model column filled in."""
     try:
-        wb = load_workbook(EXCEL_FILE)
-        sheet = wb["Состав"]
-        
+        # Other sheets are copied as they are
+        src = load_workbook(EXCEL_FILE, read_only=True)
+        wb = Workbook(write_only=True)
+        for name in src.sheetnames:
+            if name == "Состав" or name.startswith("Состав_"):
+                continue
+            copy = wb.create_sheet(name)
+            for row in src[name].iter_rows(values_only=True):
+                copy.append(row)
+        src.close()
+
         # Get header values as a list
-        header_row_values = [cell.value for cell in sheet[1]]
+        header_row_values = list(read_header(EXCEL_FILE, "Состав") or [])
         
         # Add header for Model column (after Serial) if not already there
         if "Model" not in header_row_values:
             header_row_values.append("Model")
-            sheet.delete_rows(1)
-            sheet.insert_rows(1)
-            for col, value in enumerate(header_row_values, 1):
-                sheet.cell(row=1, column=col, value=value)
             logger.info("Added 'Model' column to header.")
         
-        # Determine column indices (1-based)
-        serial_col_idx = sheet.max_column - 1  # Serial is second last
-        model_col_idx = sheet.max_column     # Model is last
+        # Determine column indices (0-based)
+        model_col_idx = header_row_values.index("Model")
+        serial_col_idx = model_col_idx - 1  # Serial is right before Model
+        
+        # Keep the current layout: shards as separate files if they already are
+        split_files = len({file_path for file_path, _ in list_shards(EXCEL_FILE, "Состав")}) > 1
+        writer = ShardedSheetWriter(EXCEL_FILE, header_row_values, sheet_name="Состав",
+                                    max_rows=MAX_ROWS_PER_SHARD, split_files=split_files, workbook=wb)
         
-        # Update rows with model based on serial using iter_rows for speed
+        # Update rows with model based on serial, one serial block at a time
         updated_count = 0
-        total_rows = sheet.max_row - 1  # Excluding header
         processed = 0
-        for row in sheet.iter_rows(min_row=2, max_row=sheet.max_row):
-            processed += 1
-            serial_cell = row[serial_col_idx - 1]  # 0-based index
-            serial = str(serial_cell.value or "").strip().upper()
+        rows = iter_shard_rows(EXCEL_FILE, "Состав", min_row=2)
+        for serial_value, group in group_rows_by_serial(rows, serial_col_idx):
+            serial = str(serial_value or "").strip().upper()
             model = models.get(serial, "N/A")
-            model_cell = row[model_col_idx - 1]
-            if model_cell.value != model:  # Only update if different
-                model_cell.value = model
-                updated_count += 1
-            
-            # Log progress every 1000 rows
-            if processed % 1000 == 0:
-                logger.info(f"Processed {processed}/{total_rows} rows, updated {updated_count} so far.")
+            out_rows = []
+            for row in group:
+                processed += 1
+                row = list(row) + [None] * (model_col_idx + 1 - len(row))
+                if row[model_col_idx] != model:  # Only count if different
+                    row[model_col_idx] = model
+                    updated_count += 1
+                out_rows.append(row)
+                
+                # Log progress every 1000 rows
+                if processed % 1000 == 0:
+                    logger.info(f"Processed {processed} rows, updated {updated_count} so far.")
+            writer.write_serial(serial_value, out_rows)
         
-        wb.save(EXCEL_FILE)
-        logger.info(f"Excel updated with models in output.xlsx (total updated: {updated_count} rows)")
+        shards = writer.close()
+        logger.info(f"Excel updated with models in output.xlsx (total updated: {updated_count} rows, {shards} shard(s))")
     except Exception as e:
         logger.error(f"Error updating Excel: {e}")
 
@@ -0,0 +1,135 @@
+import os
+import sys
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from openpyxl import load_workbook
+
+PROJECT_ROOT = Path(__file__).parent
+DOWNLOADS_DIR = PROJECT_ROOT / "downloads"
+INVALID_DIR_NAME = "invalid"  # Bad exports are moved to downloads/invalid/ so they no longer count as downloaded
+MAX_REQUEUES = 2  # Times a serial with a broken export is downloaded again
+
+# Header row of every PartsExport file
+EXPORT_HEADER = ("Description", "Commodity Type", "Part Number", "Installed Qty", "MFG Part Number", None, "Customer Serviceable")
+
+def validate_export(file_path) -> str | None:
+    """Return why an export is broken, or None if it looks good."""
+    file_path = Path(file_path)
+    if not file_path.exists() or file_path.stat().st_size == 0:
+        return "empty file"
+    if not zipfile.is_zipfile(file_path):
+        with open(file_path, 'rb') as f:
+            head = f.read(256).lstrip().lower()
+        return "HTML page instead of xlsx" if head.startswith((b"<!doctype", b"<html")) else "not a zip file"
+    try:
+        with zipfile.ZipFile(file_path) as zf:
+            bad_member = zf.testzip()  # Reads every member and checks its CRC
+        if bad_member:
+            return f"CRC mismatch in {bad_member}"
+        wb = load_workbook(file_path, read_only=True)
+        try:
+            rows = wb.active.iter_rows(max_row=2, values_only=True)
+            header = next(rows, None)
+            first_row = next(rows, None)
+        finally:
+            wb.close()
+    except Exception as e:
+        return f"unreadable: {e}"
+    if header is None or tuple(header[:len(EXPORT_HEADER)]) != EXPORT_HEADER:
+        return f"unexpected header {header}"
+    if first_row is None or all(value is None for value in first_row):
+        return "no data rows"
+    return None
+
+def quarantine(file_path) -> Path:
+    invalid_dir = Path(file_path).parent / INVALID_DIR_NAME
+    invalid_dir.mkdir(exist_ok=True)
+    target = invalid_dir / Path(file_path).name
+    os.replace(file_path, target)
+    return target
+
+async def save_download(download, file_path):
+    """Save a Playwright download via a hidden temp file + rename, so a partial file never looks finished."""
+    file_path = Path(file_path)
+    tmp_path = file_path.with_name(f".{file_path.name}.part")
+    try:
+        await download.save_as(tmp_path)
+        os.replace(tmp_path, file_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+class ExportValidator:
+    """Checks saved exports on a small thread pool; broken ones are quarantined and their serial requeued.
+
+    on_done(serial, ok) is called once a serial's outcome is final: ok=True when its
+    export passed, ok=False when it is given up after MAX_REQUEUES broken exports.
+    """
+
+    def __init__(self, max_workers=2, on_done=None):
+        self.max_workers = max_workers
+        self.on_done = on_done
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="validate")
+        self.lock = threading.Lock()
+        self.failed = []
+        self.requeues = {}
+        self.checked = 0
+
+    def submit(self, serial, file_path):
+        self.pool.submit(self._check, serial, Path(file_path))
+
+    def _check(self, serial, file_path):
+        error = validate_export(file_path)
+        with self.lock:
+            self.checked += 1
+            if error:
+                self.failed.append(serial)
+        if error:
+            if file_path.exists():
+                quarantine(file_path)
+            print(f"✗ Invalid export for {serial} ({error}), requeued.")
+        elif self.on_done:
+            self.on_done(serial, True)
+
+    def drain_failed(self) -> list:
+        """Serials whose exports failed validation since the last call."""
+        with self.lock:
+            failed, self.failed = self.failed, []
+        return failed
+
+    def requeue(self, queue) -> int:
+        """Append serials that failed validation to the download queue, up to MAX_REQUEUES times each."""
+        added = 0
+        for serial in self.drain_failed():
+            self.requeues[serial] = self.requeues.get(serial, 0) + 1
+            if self.requeues[serial] <= MAX_REQUEUES:
+                queue.append(serial)
+                added += 1
+            else:
+                print(f"✗ Giving up on {serial} after {MAX_REQUEUES} invalid exports.")
+                if self.on_done:
+                    self.on_done(serial, False)
+        return added
+
+    def wait(self):
+        """Block until every submitted file has been checked."""
+        self.pool.shutdown(wait=True)
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="validate")
+
+def main():
+    """Check every export in downloads/ and move broken ones to downloads/invalid/."""
+    downloads_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else DOWNLOADS_DIR
+    files = sorted(downloads_dir.glob("PartsExport_Serial-*.xlsx"))
+    bad = 0
+    with ThreadPoolExecutor() as pool:
+        for file_path, error in zip(files, pool.map(validate_export, files)):
+            if error:
+                bad += 1
+                quarantine(file_path)
+                print(f"✗ {file_path.name}: {error}")
+    print(f"✓ Checked {len(files)} exports, moved {bad} invalid ones to {downloads_dir / INVALID_DIR_NAME}.")
+
+if __name__ == "__main__":
+    main()
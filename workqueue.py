@@ -0,0 +1,291 @@
+import argparse
+import hmac
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+
+import requests
+from flask import Flask, request, jsonify, abort
+from pack import serial_from_filename
+from validate import validate_export
+
+PROJECT_ROOT = Path(__file__).parent
+QUEUE_DB = PROJECT_ROOT / "workqueue.db"
+DOWNLOADS_DIR = PROJECT_ROOT / "downloads"
+LEASE_SECONDS = 15 * 60  # A lease not heartbeated for this long goes back to the pool
+MAX_ATTEMPTS = 3  # Failed serials are retried this many times before they are marked failed
+# Shared secret between coordinator and workers (sent as X-Queue-Token); unset = no check
+QUEUE_TOKEN = os.environ.get("PARTS_QUEUE_TOKEN")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work (
+    serial TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending / leased / done / failed
+    lease_id TEXT,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS idx_work_status ON work(status, lease_expires);
+-- Every serial a lease was ever given, so a late result is only accepted from a real lease
+CREATE TABLE IF NOT EXISTS grants (
+    lease_id TEXT NOT NULL,
+    serial TEXT NOT NULL,
+    PRIMARY KEY (lease_id, serial)
+);
+"""
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+class LeaseStore:
+    """SQLite-backed serial queue with expiring leases.
+
+    Every call runs in its own BEGIN IMMEDIATE transaction, so several processes
+    on one machine (or the threads of the coordinator) can share the file safely.
+    """
+
+    def __init__(self, db_file=QUEUE_DB, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.db_file = db_file
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            result = fn(conn, time.time())
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def seed(self, serials) -> int:
+        """Add serials to the pool; serials already known keep their state."""
+        def op(conn, now):
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO work (serial, updated) VALUES (?, ?)",
+                             [(s.strip().upper(), now) for s in serials if s and s.strip()])
+            return conn.total_changes - before
+        return self._transaction(op)
+
+    def claim(self, worker: str, count: int) -> dict:
+        """Lease up to count pending serials to a worker; expired leases are reclaimed first."""
+        def op(conn, now):
+            conn.execute("UPDATE work SET status = 'pending', lease_id = NULL, worker = NULL, updated = ? "
+                         "WHERE status = 'leased' AND lease_expires < ?", (now, now))
+            serials = [s for (s,) in conn.execute(
+                "SELECT serial FROM work WHERE status = 'pending' ORDER BY attempts, serial LIMIT ?", (count,))]
+            lease_id = uuid.uuid4().hex
+            expires = now + self.lease_seconds
+            conn.executemany("UPDATE work SET status = 'leased', lease_id = ?, worker = ?, lease_expires = ?, "
+                             "updated = ? WHERE serial = ?",
+                             [(lease_id, worker, expires, now, s) for s in serials])
+            conn.executemany("INSERT INTO grants (lease_id, serial) VALUES (?, ?)", [(lease_id, s) for s in serials])
+            (remaining,) = conn.execute(
+                "SELECT COUNT(*) FROM work WHERE status IN ('pending', 'leased')").fetchone()
+            return {"lease_id": lease_id if serials else None, "serials": serials,
+                    "expires": expires, "remaining": remaining}
+        return self._transaction(op)
+
+    def heartbeat(self, lease_id: str) -> int:
+        """Extend a lease; returns how many serials it still holds (0 means it expired)."""
+        def op(conn, now):
+            cur = conn.execute("UPDATE work SET lease_expires = ?, updated = ? WHERE lease_id = ? AND status = 'leased'",
+                               (now + self.lease_seconds, now, lease_id))
+            return cur.rowcount
+        return self._transaction(op)
+
+    def complete(self, lease_id: str, serial: str, ok: bool, result: str | None = None) -> str:
+        """Report one serial of a lease; returns the serial's new status."""
+        serial = serial.strip().upper()
+
+        def op(conn, now):
+            row = conn.execute("SELECT status, lease_id, attempts FROM work WHERE serial = ?", (serial,)).fetchone()
+            if row is None:
+                return "unknown"
+            status, current_lease, attempts = row
+            if not conn.execute("SELECT 1 FROM grants WHERE lease_id = ? AND serial = ?", (lease_id, serial)).fetchone():
+                return "invalid lease"
+            if status == "done":
+                return status
+            if ok:
+                # A good result is kept even if the lease expired meanwhile, so nothing is downloaded twice
+                conn.execute("UPDATE work SET status = 'done', lease_id = NULL, result = ?, updated = ? "
+                             "WHERE serial = ?", (result, now, serial))
+                return "done"
+            if current_lease != lease_id:
+                return status  # Stale lease: the serial was already handed to someone else
+            attempts += 1
+            status = "failed" if attempts >= self.max_attempts else "pending"
+            conn.execute("UPDATE work SET status = ?, lease_id = NULL, worker = NULL, attempts = ?, result = ?, "
+                         "updated = ? WHERE serial = ?", (status, attempts, result, now, serial))
+            return status
+        return self._transaction(op)
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM work GROUP BY status").fetchall())
+            workers = dict(conn.execute(
+                "SELECT worker, COUNT(*) FROM work WHERE status = 'leased' GROUP BY worker").fetchall())
+        finally:
+            conn.close()
+        return {"counts": counts, "workers": workers}
+
+class LeaseClient:
+    """HTTP client for the coordinator, with the same claim/heartbeat/complete calls as LeaseStore."""
+
+    def __init__(self, base_url: str, timeout: int = 60, token: str | None = QUEUE_TOKEN):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.http = requests.Session()
+        if token:
+            self.http.headers["X-Queue-Token"] = token
+
+    def _post(self, path, **kwargs):
+        resp = self.http.post(f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+
+    def claim(self, worker: str, count: int) -> dict:
+        return self._post("/claim", json={"worker": worker, "count": count})
+
+    def heartbeat(self, lease_id: str) -> int:
+        return self._post("/heartbeat", json={"lease_id": lease_id})["held"]
+
+    def complete(self, lease_id: str, serial: str, ok: bool, file_path: Path | None = None) -> str:
+        """Report a serial; a downloaded export is uploaded so it ends up in the coordinator's downloads/."""
+        data = {"lease_id": lease_id, "serial": serial, "ok": "1" if ok else "0"}
+        if ok and file_path:
+            with open(file_path, "rb") as f:
+                return self._post("/complete", data=data, files={"file": (Path(file_path).name, f)})["status"]
+        return self._post("/complete", data=data)["status"]
+
+    def stats(self) -> dict:
+        resp = self.http.get(f"{self.base_url}/stats", timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+class LocalLeaseClient:
+    """LeaseStore used directly by workers on the coordinator's machine (shared downloads/)."""
+
+    def __init__(self, db_file=QUEUE_DB):
+        self.store = LeaseStore(db_file)
+
+    def claim(self, worker: str, count: int) -> dict:
+        return self.store.claim(worker, count)
+
+    def heartbeat(self, lease_id: str) -> int:
+        return self.store.heartbeat(lease_id)
+
+    def complete(self, lease_id: str, serial: str, ok: bool, file_path: Path | None = None) -> str:
+        return self.store.complete(lease_id, serial, ok, Path(file_path).name if file_path else None)
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+def connect(target: str):
+    """http(s)://host:port -> coordinator client, anything else is a local queue db path."""
+    if target.startswith(("http://", "https://")):
+        return LeaseClient(target)
+    return LocalLeaseClient(target)
+
+def create_app(store: LeaseStore, downloads_dir=DOWNLOADS_DIR, token: str | None = QUEUE_TOKEN) -> Flask:
+    app = Flask(__name__)
+    downloads_dir = Path(downloads_dir)
+    downloads_dir.mkdir(exist_ok=True)
+
+    @app.before_request
+    def check_token():
+        if token and not hmac.compare_digest(request.headers.get("X-Queue-Token", ""), token):
+            abort(403, description="Bad or missing X-Queue-Token.")
+
+    @app.post("/claim")
+    def claim():
+        payload = request.get_json(force=True)
+        count = max(1, min(int(payload.get("count", 10)), 500))
+        return jsonify(store.claim(payload.get("worker") or "unknown", count))
+
+    @app.post("/heartbeat")
+    def heartbeat():
+        payload = request.get_json(force=True)
+        return jsonify(held=store.heartbeat(payload["lease_id"]))
+
+    @app.post("/complete")
+    def complete():
+        serial = request.form.get("serial", "")
+        if not serial:
+            abort(400, description="serial is required.")
+        ok = request.form.get("ok") == "1"
+        result, tmp_path, error = None, None, None
+        upload = request.files.get("file")
+        if ok and upload:
+            result = Path(upload.filename or "").name
+            if (not result.startswith("PartsExport_Serial-") or not result.endswith(".xlsx")
+                    or serial_from_filename(result) != serial.strip().upper()):
+                abort(400, description="file must be named PartsExport_Serial-<serial>_*.xlsx")
+            tmp_path = downloads_dir / f".upload-{uuid.uuid4().hex[:8]}-{result}"  # Hidden, but still .xlsx for openpyxl
+            upload.save(tmp_path)
+            error = validate_export(tmp_path)
+            if error:
+                # Counts as a failed attempt, so the serial is downloaded again
+                ok, result = False, None
+        try:
+            status = store.complete(request.form.get("lease_id", ""), serial, ok, result)
+            # Only a result accepted for a real lease of this serial lands in downloads/
+            if tmp_path and not error and status == "done":
+                os.replace(tmp_path, downloads_dir / Path(upload.filename).name)
+        finally:
+            if tmp_path and tmp_path.exists():
+                tmp_path.unlink()
+        return jsonify(status=status, error=error)
+
+    @app.get("/stats")
+    def stats():
+        return jsonify(store.stats())
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Lease-based serial queue shared by scraper nodes.")
+    parser.add_argument("--db", default=QUEUE_DB, type=Path, help="Queue SQLite file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("seed", help="Add the not-yet-downloaded serials from serials.xlsx to the queue")
+    p = sub.add_parser("serve", help="Run the coordinator for workers on other nodes")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=8700)
+    p.add_argument("--lease-seconds", type=int, default=LEASE_SECONDS)
+    sub.add_parser("stats", help="Print queue counts")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        from manualapp import load_serials_from_excel
+        added = LeaseStore(args.db).seed(load_serials_from_excel())
+        print(f"✓ Added {added} serials to {args.db}")
+    elif args.command == "serve":
+        store = LeaseStore(args.db, lease_seconds=args.lease_seconds)
+        create_app(store).run(host=args.host, port=args.port, threaded=True)
+    elif args.command == "stats":
+        print(LeaseStore(args.db).stats())
+
+if __name__ == "__main__":
+    main()